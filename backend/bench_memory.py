@@ -0,0 +1,128 @@
+"""
+Memory benchmark for the deterministic part of resume analysis.
+
+Runs what /analyze and the batch CLI do before the LLM calls and keeps each result
+in flight, as a batch run does while resumes wait for LLM slots:
+
+    legacy          the old dict-of-lists process_resume_content and dict-based ATS
+                    scoring (legacy_resume.py); it has no fingerprinting step
+    dict            parse, ATS score and fingerprints (which build every analysis
+                    prompt), keeping the result converted with to_dict()
+    ResumeDocument  the same pipeline keeping the span-based ResumeDocument
+
+    python bench_memory.py                 # synthetic resumes
+    python bench_memory.py ./resumes -n 500
+"""
+import argparse
+import pickle
+import random
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+import legacy_resume
+from file import EnhancedResumeAnalyzer, collect_pdf_paths
+
+SECTION_LINES = {
+    'Professional Summary': [
+        "Senior software engineer with 8 years of experience building data platforms.",
+        "Proven track record of leading teams and delivering scalable cloud solutions."
+    ],
+    'Work Experience': [
+        "Senior Engineer, Acme Corp, Jan 2019 - Present",
+        "- Led team of 12 engineers migrating services to AWS and Kubernetes",
+        "- Reduced infrastructure cost by 35% and served 2,000,000 users",
+        "- Built machine learning pipelines in Python and SQL for forecasting",
+        "Software Engineer, Globex, Jun 2015 - Dec 2018",
+        "- Implemented REST APIs in Java and Go, increasing throughput by 40%",
+        "- Mentoring junior developers and driving process improvement"
+    ],
+    'Education': [
+        "BSc Computer Science, State University, 2011 - 2015"
+    ],
+    'Technical Skills': [
+        "python, java, go, sql, postgresql, docker, kubernetes, aws, gcp",
+        "machine learning, deep learning, nlp, project management, team leadership"
+    ],
+    'Key Projects': [
+        "Real-time analytics platform processing $5 million in daily transactions",
+        "Open source contributor to 3 projects with 500+ users"
+    ]
+}
+
+
+def synthetic_resume(rng: random.Random) -> str:
+    lines = ["Jane Doe", "jane.doe@example.com | (555) 123-4567"]
+    for heading, content in SECTION_LINES.items():
+        lines.append(heading)
+        repeat = rng.randint(1, 3)
+        lines.extend(content * repeat)
+    return '\n'.join(lines)
+
+
+def measure(build: Callable[[str], object], texts: List[str]) -> Tuple[int, int, List[object]]:
+    """Return (retained bytes, peak bytes, results) for building one result per text."""
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    results = [build(text) for text in texts]
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retained - baseline, peak - baseline, results
+
+
+def timed(build: Callable[[str], object], texts: List[str]) -> float:
+    """Run without tracemalloc, whose hooks slow allocation-heavy code unevenly."""
+    started = time.perf_counter()
+    for text in texts:
+        build(text)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='*', help="PDF files, directories or glob patterns (default: synthetic)")
+    parser.add_argument('-n', '--count', type=int, default=1000, help="Number of resumes to hold at once")
+    args = parser.parse_args()
+
+    analyzer = EnhancedResumeAnalyzer()
+    if args.inputs:
+        texts = []
+        for path in collect_pdf_paths(args.inputs)[:args.count]:
+            try:
+                with open(path, 'rb') as f:
+                    texts.append(analyzer.extract_text_from_pdf(f.read()))
+            except Exception:
+                print(f"Skipping unreadable PDF: {path}")
+    else:
+        rng = random.Random(0)
+        texts = [synthetic_resume(rng) for _ in range(args.count)]
+    if not texts:
+        raise SystemExit("No resumes to benchmark")
+
+    def legacy_pipeline(text: str) -> Tuple[object, float]:
+        content = legacy_resume.process_resume_content(analyzer, text)
+        return content, legacy_resume.calculate_ats_score(analyzer, content)
+
+    def pipeline(text: str, serialize: bool) -> Tuple[object, float, dict]:
+        document = analyzer.parse_resume(text)
+        result = document.to_dict() if serialize else document
+        return result, analyzer.calculate_ats_score(document), analyzer.fingerprint_resume_content(document)
+
+    pipelines = [
+        ("legacy", legacy_pipeline),
+        ("dict", lambda text: pipeline(text, True)),
+        ("ResumeDocument", lambda text: pipeline(text, False))
+    ]
+
+    text_bytes = sum(len(text.encode('utf-8')) for text in texts)
+    print(f"{len(texts)} resumes, {text_bytes / 1024:.0f} KiB of text\n")
+    print(f"{'results held as':<16}{'retained KiB':>14}{'peak KiB':>12}{'pickled KiB':>14}{'seconds':>10}")
+    for name, build in pipelines:
+        retained, peak, results = measure(build, texts)
+        pickled = sum(len(pickle.dumps(result[0])) for result in results)
+        del results
+        elapsed = timed(build, texts)
+        print(f"{name:<16}{retained / 1024:>14.0f}{peak / 1024:>12.0f}{pickled / 1024:>14.0f}{elapsed:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -8,12 +8,177 @@ import json
 from collections import defaultdict
 import asyncio
 import traceback
-from typing import Dict, List, Tuple, Optional, Any 
+import hashlib
+import uuid
+import argparse
+import glob
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, redirect_stdout
+from array import array
+from typing import Dict, List, Tuple, Optional, Any, Union
+
+# A non-empty line with surrounding whitespace excluded, i.e. the span of line.strip()
+_LINE_RE = re.compile(r'\S(?:[^\n]*\S)?')
+_WORD_RE = re.compile(r'\S+')
+_SENTENCE_END_RE = re.compile(r'[.!?]+')
+_INDENT_RE = re.compile(r'\n[ \t]+')
+
+# Rough average for English text with Mistral's tokenizer
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens in a string."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+_MONTHS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+
+def _date_recency(date: str) -> Tuple[int, int]:
+    """Sort key (year, month) for an extracted date string; unknown months sort first."""
+    numbers = re.findall(r'\d+', date)
+    year = int(numbers[-1]) if numbers else 0
+    current_year = datetime.now().year
+    if year < 100:
+        year += 2000 if year <= current_year % 100 else 1900
+    if year > current_year + 10:
+        year = 0  # phone numbers and other four-digit figures matched as years
+    month = date[:3].lower()
+    return year, _MONTHS.index(month) + 1 if month in _MONTHS else 0
+
+def _compact_whitespace(text: str) -> str:
+    """Drop source-code indentation from prompt text; it costs tokens and carries no meaning."""
+    return _INDENT_RE.sub('\n', text).strip()
+
+class ResumeDocument:
+    """
+    Parsed resume that holds the text once. Lines, sections, skills, metrics and
+    dates are stored as (start, end) offsets into it in flat integer arrays.
+    ATS scoring, fingerprinting and prompt building read it directly, and the full
+    dict shape is only built by to_dict() when the result is serialized.
+    """
+    __slots__ = (
+        'text',
+        'line_spans',     # [start, end, ...] of each stripped content line
+        'blocks',         # [section_id, first_line, end_line, ...] in document order
+        'section_names',  # section_id -> name, in order of first appearance
+        'skill_keys',     # skill_id -> (category, subcategory)
+        'skill_spans',    # [skill_id, start, end, ...]
+        'metric_spans',   # [start, end, ...]
+        'date_spans',     # [start, end, ...]
+        'line_skill_spans'  # like skill_spans but cut at line ends; filled on first use for prompts
+    )
+
+    def __init__(self, text: str, skill_keys: List[Tuple[str, str]]):
+        self.text = text
+        self.line_spans = array('I')
+        self.blocks = array('I')
+        self.section_names: List[str] = []
+        self.skill_keys = skill_keys
+        self.skill_spans = array('I')
+        self.metric_spans = array('I')
+        self.date_spans = array('I')
+        self.line_skill_spans: Optional[array] = None
+
+    def _unique_slices(self, spans: array) -> List[str]:
+        text = self.text
+        return sorted({text[spans[i]:spans[i + 1]] for i in range(0, len(spans), 2)})
+
+    def section_lines(self, name: str) -> List[str]:
+        """All lines of one section, across its blocks, in document order."""
+        if name not in self.section_names:
+            return []
+        section_id = self.section_names.index(name)
+        text, lines = self.text, self.line_spans
+        return [
+            text[lines[2 * line]:lines[2 * line + 1]]
+            for i in range(0, len(self.blocks), 3) if self.blocks[i] == section_id
+            for line in range(self.blocks[i + 1], self.blocks[i + 2])
+        ]
+
+    def word_count(self) -> int:
+        return sum(1 for _ in _WORD_RE.finditer(self.text))
+
+    def sections(self) -> Dict[str, List[str]]:
+        """Section name -> list of blocks, each block being its lines joined by newlines."""
+        text, lines = self.text, self.line_spans
+        sections = {name: [] for name in self.section_names}
+        for i in range(0, len(self.blocks), 3):
+            section_id, first, end = self.blocks[i:i + 3]
+            sections[self.section_names[section_id]].append('\n'.join(
+                text[lines[2 * line]:lines[2 * line + 1]] for line in range(first, end)
+            ))
+        return sections
+
+    def section_statistics(self) -> Dict[str, Dict[str, int]]:
+        """Word and sentence counts per section, computed on the spans without slicing."""
+        text, lines = self.text, self.line_spans
+        word_counts = [0] * len(self.section_names)
+        # Lines never share a sentence terminator run, so every section starts at one
+        sentence_counts = [1] * len(self.section_names)
+        for i in range(0, len(self.blocks), 3):
+            section_id, first, end = self.blocks[i:i + 3]
+            for line in range(first, end):
+                start, stop = lines[2 * line], lines[2 * line + 1]
+                word_counts[section_id] += sum(1 for _ in _WORD_RE.finditer(text, start, stop))
+                sentence_counts[section_id] += sum(1 for _ in _SENTENCE_END_RE.finditer(text, start, stop))
+        return {
+            name: {
+                'word_count': word_counts[section_id],
+                'sentence_count': sentence_counts[section_id]
+            }
+            for section_id, name in enumerate(self.section_names)
+        }
+
+    def skills(self, spans: Optional[array] = None) -> Dict[str, Dict[str, List[str]]]:
+        """Category -> subcategory -> sorted unique skill phrases (from `spans`, default skill_spans)."""
+        text = self.text
+        spans = self.skill_spans if spans is None else spans
+        found_skills = defaultdict(lambda: defaultdict(set))
+        for i in range(0, len(spans), 3):
+            skill_id, start, end = spans[i:i + 3]
+            category, subcategory = self.skill_keys[skill_id]
+            found_skills[category][subcategory].add(text[start:end].lower())
+        # Keep the configured category order rather than the order of discovery
+        return {
+            category: {
+                subcat: sorted(found_skills[category][subcat])
+                for subcat in dict.fromkeys(sub for cat, sub in self.skill_keys if cat == category)
+                if found_skills[category][subcat]
+            }
+            for category in dict.fromkeys(cat for cat, _ in self.skill_keys)
+            if category in found_skills
+        }
+
+    def metrics(self) -> List[str]:
+        return self._unique_slices(self.metric_spans)
+
+    def dates(self) -> List[str]:
+        return self._unique_slices(self.date_spans)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize to the dict shape returned by process_resume_content."""
+        return {
+            'raw_text': self.text,
+            'sections': self.sections(),
+            'skills': self.skills(),
+            'metrics': self.metrics(),
+            'dates': self.dates(),
+            'section_statistics': self.section_statistics()
+        }
+
+# Consumers take a parsed document, or the dict from process_resume_content for compatibility
+ResumeContent = Union[ResumeDocument, Dict[str, Any]]
 
 class EnhancedResumeAnalyzer:
-    def __init__(self, mistral_api_key: str):
-        """Initialize the Enhanced Resume Analyzer with lightweight analysis capabilities."""
-        self.client = Mistral(api_key=mistral_api_key)
+    def __init__(self, mistral_api_key: Optional[str] = None):
+        """Initialize the Enhanced Resume Analyzer with lightweight analysis capabilities.
+
+        The Mistral client is only created when an API key is given, so the
+        deterministic stages (extraction, parsing, ATS scoring) can run without one.
+        """
+        self.client = Mistral(api_key=mistral_api_key) if mistral_api_key else None
         self.skill_categories = {
             'technical_skills': {
                 'programming': ['python', 'java', 'javascript', 'c++', 'ruby', 'go'],
@@ -88,159 +253,57 @@ class EnhancedResumeAnalyzer:
             'specific dates',
             'pdf format'
         ]
-        
-    def extract_text_from_pdf(self, pdf_content: bytes) -> str:
-        """Extract and clean text from PDF with enhanced formatting preservation."""
-        try:
-            pdf_file = BytesIO(pdf_content)
-            reader = PyPDF2.PdfReader(pdf_file)
-            text_blocks = []
-            for page in reader.pages:
-                text = page.extract_text()
-                if text:
-                    text = re.sub(r'(\r\n|\r|\n)\s*(\r\n|\r|\n)', '\n\n', text)
-                    text = re.sub(r'\s{2,}', ' ', text)
-                    text_blocks.append(text.strip())
-            return '\n\n'.join(text_blocks)
-        except Exception as e:
-            print(f"Error extracting PDF content: {e}")
-            raise
 
-    def identify_section(self, text: str) -> str:
-        """Identify resume section based on pattern matching."""
-        text_lower = text.lower()
-        for section, patterns in self.section_patterns.items():
-            if any(pattern in text_lower for pattern in patterns):
-                return section
-        return None
-
-    def count_sentences(self, text: str) -> int:
-        """Simple sentence counter using regular expressions."""
-        if not text:
-            return 0
-        return len(re.split(r'[.!?]+', text))
-
-    def extract_dates(self, text: str) -> List[str]:
-        """Extract dates from text."""
-        if not text:
-            return []
-            
-        date_patterns = [
+        # Compiled once so parsing can match on offsets into the original text
+        self._section_regexes = [
+            (section, re.compile('|'.join(re.escape(pattern) for pattern in patterns), re.IGNORECASE))
+            for section, patterns in self.section_patterns.items()
+        ]
+        # A whole-word match of a single-word keyword is just membership in the text's set of
+        # words; only multi-word keywords need their own regex
+        self._keyword_regexes = [
+            None if re.fullmatch(r'\w+', keyword) else re.compile(r'\b' + re.escape(keyword) + r'\b')
+            for keyword in self.industry_keywords
+        ]
+        # Most lines are not headings; one combined search rules them out before the ordered checks
+        self._any_section_regex = re.compile(
+            '|'.join(regex.pattern for _, regex in self._section_regexes), re.IGNORECASE
+        )
+        self._skill_keys = []
+        self._skill_regexes = []
+        for main_category, subcategories in self.skill_categories.items():
+            for subcategory, keywords in subcategories.items():
+                self._skill_keys.append((main_category, subcategory))
+                self._skill_regexes.append([
+                    re.compile(rf'\b{re.escape(keyword)}\b(?:[,\s]+(?:\w+\s+){{0,3}}\w+)*')
+                    for keyword in keywords
+                ])
+        self._date_regexes = [re.compile(pattern, re.IGNORECASE) for pattern in [
             r'\b\d{4}\b',
             r'\b(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\s+\d{4}\b',
             r'\d{1,2}/\d{1,2}/\d{2,4}',
             r'\d{1,2}-\d{1,2}-\d{2,4}'
-        ]
-        
-        dates = []
-        for pattern in date_patterns:
-            dates.extend(re.findall(pattern, text, re.IGNORECASE))
-        return sorted(list(set(dates)))
-
-    def extract_metrics(self, text: str) -> List[str]:
-        """Extract metrics and achievements with numbers."""
-        if not text:
-            return []
-            
-        metric_patterns = [
+        ]]
+        self._metric_regexes = [re.compile(pattern, re.IGNORECASE) for pattern in [
             r'\$\s*\d+(?:,\d{3})*(?:\.\d{2})?(?:\s*(?:million|billion|k))?',
             r'\d+(?:,\d{3})*%',
             r'\d+(?:,\d{3})*\+?\s*(?:users|customers|clients|employees|people|projects|years)'
-        ]
-        
-        metrics = []
-        for pattern in metric_patterns:
-            metrics.extend(re.findall(pattern, text, re.IGNORECASE))
-        return sorted(list(set(metrics)))
-
-    def categorize_skills(self, text: str) -> dict:
-        """Categorize skills using regex pattern matching."""
-        if not text:
-            return {}
-            
-        text_lower = text.lower()
-        found_skills = defaultdict(lambda: defaultdict(set))
-        for main_category, subcategories in self.skill_categories.items():
-            for subcategory, keywords in subcategories.items():
-                for keyword in keywords:
-                    pattern = rf'\b{re.escape(keyword)}\b(?:[,\s]+(?:\w+\s+){{0,3}}\w+)*'
-                    matches = re.finditer(pattern, text_lower)
-                    for match in matches:
-                        found_skills[main_category][subcategory].add(match.group().strip())
-        return {
-            category: {
-                subcat: sorted(list(skills))
-                for subcat, skills in subcategories.items()
-                if skills  # Only include non-empty skill sets
-            }
-            for category, subcategories in found_skills.items()
-        }
+        ]]
 
-    def process_resume_content(self, text: str) -> dict:
-        """Process resume content with lightweight section detection and analysis."""
-        if not text:
-            return {
-                'raw_text': '',
-                'sections': {},
-                'skills': {},
-                'metrics': [],
-                'dates': [],
-                'section_statistics': {}
-            }
-            
-        sections = defaultdict(list)
-        current_section = None
-        section_text = []
-        lines = text.split('\n')
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            detected_section = self.identify_section(line)
-            if detected_section:
-                if current_section and section_text:
-                    sections[current_section].append('\n'.join(section_text))
-                    section_text = []
-                current_section = detected_section
-            elif current_section:
-                section_text.append(line)
-            else:
-                # If no section detected yet, add to general section
-                sections['general'].append(line)
-                
-        if current_section and section_text:
-            sections[current_section].append('\n'.join(section_text))
-            
-        processed_content = {
-            'raw_text': text,
-            'sections': dict(sections),
-            'skills': self.categorize_skills(text),
-            'metrics': self.extract_metrics(text),
-            'dates': self.extract_dates(text),
-            'section_statistics': {
-                section: {
-                    'word_count': len(' '.join(content).split()),
-                    'sentence_count': self.count_sentences(' '.join(content))
-                }
-                for section, content in sections.items()
-            }
-        }
-        return processed_content
-
-    async def get_ai_analysis(self, resume_content: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate comprehensive AI analysis with improved prompts for deeper insights"""
-        try:
-            if not resume_content or not isinstance(resume_content, dict):
-                raise ValueError("Invalid resume content provided")
-            analyses = {
-                'career_trajectory': '',
-                'skills_analysis': '',
-                'resume_optimization': '',
-                'action_plan': ''
-            }
-            analysis_prompts = {
-                'career_trajectory': {
-                    'prompt': """Analyze the career trajectory based on the provided resume data:
+        # Prompts and settings for each AI analysis section
+        self._field_labels = {'skills': 'Professional Skills', 'dates': 'Career Timeline', 'metrics': 'Key Metrics'}
+        self.analysis_model = "mistral-medium"
+        self.analysis_system_message = """You are an expert career advisor and resume analyst. 
+                        Provide detailed, actionable insights based on the resume content.
+                        Focus on specific examples and concrete recommendations.
+                        Format your response in clear paragraphs with line breaks between main points."""
+        # 'token_budget' is the resume content tokens per prompt. Each non-empty field takes what it
+        # needs up to its cap; the sections present share the rest by their order in 'sections'
+        # (each getting half the weight of the one before), and whatever a field or section leaves
+        # unused goes to the highest-priority section that was cut off
+        self.analysis_prompts = {
+            'career_trajectory': {
+                'prompt': """Analyze the career trajectory based on the provided resume data:
                             1. Career progression pattern
         - Track job titles and promotions timeline
         - Note major role transitions
@@ -256,10 +319,13 @@ class EnhancedResumeAnalyzer:
         5. Future potential
         - Identify next career move
         - Assess growth opportunities""",
-                    'timeout': 45.0
-                },
-                'skills_analysis': {
-                    'prompt': """Analyze the technical and professional skills:
+                'timeout': 45.0,
+                'token_budget': 900,
+                'sections': ['experience', 'summary', 'achievements', 'projects', 'education'],
+                'fields': {'dates': 60, 'metrics': 120}
+            },
+            'skills_analysis': {
+                'prompt': """Analyze the technical and professional skills:
         1. Core competencies
         - List main technical skills
         - Note proficiency levels
@@ -275,10 +341,13 @@ class EnhancedResumeAnalyzer:
         5. Transferable skills
         - Identify cross-industry skills
         - List universal abilities""",
-                    'timeout': 45.0
-                },
-                'resume_optimization': {
-                    'prompt': """Optimization recommendations:
+                'timeout': 45.0,
+                'token_budget': 700,
+                'sections': ['skills', 'certifications', 'experience', 'projects', 'education'],
+                'fields': {'skills': 250}
+            },
+            'resume_optimization': {
+                'prompt': """Optimization recommendations:
         1. Content improvements
         - Add missing metrics
         - Strengthen examples
@@ -294,10 +363,13 @@ class EnhancedResumeAnalyzer:
         5. ATS optimization
         - Add relevant keywords
         - Adjust formatting""",
-                    'timeout': 45.0
-                },
-                'action_plan': {
-                    'prompt': """Action plan:
+                'timeout': 45.0,
+                'token_budget': 900,
+                'sections': ['experience', 'summary', 'achievements', 'projects', 'skills'],
+                'fields': {'metrics': 120, 'skills': 200}
+            },
+            'action_plan': {
+                'prompt': """Action plan:
         1. Short-term goals
         - List 3-month priorities
         - Set immediate targets
@@ -313,51 +385,435 @@ class EnhancedResumeAnalyzer:
         5. Career steps
         - Set promotion goals
         - List target companies""",
-                    'timeout': 45.0
-                }
+                'timeout': 45.0,
+                'token_budget': 700,
+                'sections': ['experience', 'summary', 'skills', 'certifications', 'education'],
+                'fields': {'skills': 200, 'dates': 60}
             }
-            for analysis_type, config in analysis_prompts.items():
+        }
+        
+    def extract_text_from_pdf(self, pdf_content: bytes) -> str:
+        """Extract and clean text from PDF with enhanced formatting preservation."""
+        try:
+            pdf_file = BytesIO(pdf_content)
+            reader = PyPDF2.PdfReader(pdf_file)
+            text_blocks = []
+            for page in reader.pages:
+                text = page.extract_text()
+                if text:
+                    text = re.sub(r'(\r\n|\r|\n)\s*(\r\n|\r|\n)', '\n\n', text)
+                    text = re.sub(r'\s{2,}', ' ', text)
+                    text_blocks.append(text.strip())
+            return '\n\n'.join(text_blocks)
+        except Exception as e:
+            print(f"Error extracting PDF content: {e}")
+            raise
+
+    def identify_section(self, text: str) -> str:
+        """Identify resume section based on pattern matching."""
+        text_lower = text.lower()
+        for section, patterns in self.section_patterns.items():
+            if any(pattern in text_lower for pattern in patterns):
+                return section
+        return None
+
+    def count_sentences(self, text: str) -> int:
+        """Simple sentence counter using regular expressions."""
+        if not text:
+            return 0
+        return len(re.split(r'[.!?]+', text))
+
+    def extract_dates(self, text: str) -> List[str]:
+        """Extract dates from text."""
+        if not text:
+            return []
+        return sorted({match.group() for regex in self._date_regexes for match in regex.finditer(text)})
+
+    def extract_metrics(self, text: str) -> List[str]:
+        """Extract metrics and achievements with numbers."""
+        if not text:
+            return []
+        return sorted({match.group() for regex in self._metric_regexes for match in regex.finditer(text)})
+
+    def categorize_skills(self, text: str) -> dict:
+        """Categorize skills using regex pattern matching."""
+        if not text:
+            return {}
+        document = ResumeDocument(text, self._skill_keys)
+        self._find_skills(document)
+        return document.skills()
+
+    def _identify_section_span(self, text: str, start: int, end: int) -> Optional[str]:
+        """identify_section() for text[start:end], without slicing the line out."""
+        if not self._any_section_regex.search(text, start, end):
+            return None
+        for section, regex in self._section_regexes:
+            if regex.search(text, start, end):
+                return section
+        return None
+
+    def _match_skills(self, text: str, line_bounded: bool = False) -> array:
+        """[skill_id, start, end, ...] of every skill phrase in `text`."""
+        spans = array('I')
+        # Matching a temporary lowercase copy is much faster than re.IGNORECASE; its offsets
+        # only line up with the original text when lowercasing kept the length unchanged
+        text_lower = text.lower()
+        if len(text_lower) == len(text):
+            text, flags = text_lower, 0
+        else:
+            flags = re.IGNORECASE
+        if line_bounded:
+            # NUL is neither a word nor a whitespace character, so phrases stop at line ends
+            text = text.replace('\n', '\x00')
+        for skill_id, regexes in enumerate(self._skill_regexes):
+            for regex in regexes:
+                if flags:
+                    regex = re.compile(regex.pattern, flags)
+                for match in regex.finditer(text):
+                    spans.extend((skill_id, match.start(), match.end()))
+        return spans
+
+    def _find_skills(self, document: ResumeDocument) -> None:
+        document.skill_spans = self._match_skills(document.text)
+
+    def _prompt_skills(self, document: ResumeDocument) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Skills as sent to the LLM. The extracted skill phrases can run on across lines, which
+        would make an edit to one line change the skills field; these are cut at line ends.
+        """
+        if document.line_skill_spans is None:
+            document.line_skill_spans = self._match_skills(document.text, line_bounded=True)
+        return document.skills(document.line_skill_spans)
+
+    def parse_resume(self, text: str) -> ResumeDocument:
+        """Parse resume text into a span-based ResumeDocument with section, skill, metric and date offsets."""
+        document = ResumeDocument(text or '', self._skill_keys)
+        if not text:
+            return document
+
+        section_ids = {}
+        blocks, line_spans = document.blocks, document.line_spans
+
+        def add_block(section: str, first: int, end: int) -> None:
+            if section not in section_ids:
+                section_ids[section] = len(document.section_names)
+                document.section_names.append(section)
+            blocks.extend((section_ids[section], first, end))
+
+        current_section = None
+        block_start = line_count = 0
+        for match in _LINE_RE.finditer(text):
+            start, end = match.span()
+            detected_section = self._identify_section_span(text, start, end)
+            if detected_section:
+                if current_section and line_count > block_start:
+                    add_block(current_section, block_start, line_count)
+                current_section = detected_section
+                block_start = line_count
+                continue
+            line_spans.extend((start, end))
+            line_count += 1
+            if not current_section:
+                # If no section detected yet, each line is its own general entry
+                add_block('general', line_count - 1, line_count)
+        if current_section and line_count > block_start:
+            add_block(current_section, block_start, line_count)
+
+        self._find_skills(document)
+        for regex in self._metric_regexes:
+            for match in regex.finditer(text):
+                document.metric_spans.extend(match.span())
+        for regex in self._date_regexes:
+            for match in regex.finditer(text):
+                document.date_spans.extend(match.span())
+        return document
+
+    def process_resume_content(self, text: str) -> dict:
+        """Process resume content with lightweight section detection and analysis."""
+        return self.parse_resume(text).to_dict()
+
+    def _as_document(self, resume_content: ResumeContent) -> ResumeDocument:
+        """Return a ResumeDocument, re-parsing the raw text if given the serialized dict."""
+        if isinstance(resume_content, ResumeDocument):
+            return resume_content
+        return self.parse_resume(resume_content.get('raw_text', ''))
+
+    def _select_section_lines(self, lines: List[str], share: int) -> Tuple[List[str], int]:
+        """Longest prefix of a section's lines that fits in `share` tokens, and the tokens it uses."""
+        selected = []
+        used = 0
+        for line in lines:
+            cost = estimate_tokens(line) + 1  # and its line break
+            if used + cost > share:
+                if not selected and share > 1:
+                    # One long unbroken line: keep as much of it as the share allows
+                    selected.append(line[:(share - 1) * CHARS_PER_TOKEN])
+                    used = share
+                break
+            selected.append(line)
+            used += cost
+        return selected, used
+
+    def _ranked_field(self, document: ResumeDocument, field: str) -> List[Any]:
+        """
+        A field's values, most relevant first, which is the order prompts keep them in when trimming:
+        - skills: (category, subcategory, phrase), shortest phrase first, since the bare skill
+          carries the signal and long phrases are mostly surrounding text; ties follow the
+          configured category order
+        - dates: most recent year first, then by month
+        - metrics: money, then percentages, then counts (the order of the metric patterns),
+          each in document order
+        """
+        if field == 'skills':
+            key_order = {key: index for index, key in enumerate(self._skill_keys)}
+            return sorted(
+                ((category, subcategory, phrase)
+                 for category, subcategories in self._prompt_skills(document).items()
+                 for subcategory, phrases in subcategories.items()
+                 for phrase in phrases),
+                key=lambda item: (len(item[2]), key_order[item[:2]], item[2])
+            )
+        if field == 'dates':
+            return sorted(document.dates(), key=_date_recency, reverse=True)
+        text, spans = document.text, document.metric_spans
+        return list(dict.fromkeys(text[spans[i]:spans[i + 1]] for i in range(0, len(spans), 2)))
+
+    def _fit_field(self, field: str, ranked: List[Any], max_tokens: int) -> Any:
+        """
+        Keep the longest prefix of `ranked` whose compact JSON fits in `max_tokens`. Skills come
+        back nested by category and subcategory, with no empty lists or categories.
+        """
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        if field != 'skills':
+            kept = []
+            chars = 2  # []
+            for item in ranked:
+                cost = len(json.dumps(item)) + (1 if kept else 0)
+                if chars + cost > max_chars:
+                    break
+                kept.append(item)
+                chars += cost
+            return kept
+
+        found = {}
+        chars = 2  # {}
+        for category, subcategory, phrase in ranked:
+            subcategories = found.get(category)
+            cost = len(json.dumps(phrase))
+            if subcategories is None:
+                # ,"category":{"subcategory":[...]}
+                cost += len(json.dumps(category)) + len(json.dumps(subcategory)) + 6 + (1 if found else 0)
+            elif subcategory not in subcategories:
+                cost += len(json.dumps(subcategory)) + 3 + 1
+            else:
+                cost += 1
+            if chars + cost > max_chars:
+                break
+            found.setdefault(category, {}).setdefault(subcategory, []).append(phrase)
+            chars += cost
+        # Present categories in the configured order; phrases stay most relevant first
+        return {
+            category: {
+                subcategory: found[category][subcategory]
+                for subcategory in dict.fromkeys(sub for cat, sub in self._skill_keys if cat == category)
+                if subcategory in found[category]
+            }
+            for category in dict.fromkeys(cat for cat, _ in self._skill_keys)
+            if category in found
+        }
+
+    def analysis_inputs(self, resume_content: ResumeContent, analysis_type: str) -> Dict[str, Dict[str, Any]]:
+        """
+        The resume content one analysis type sends to the LLM, as {'fields': {...}, 'sections': {...}}.
+        Empty fields are left out. Each section present gets a share of the budget left after the
+        fields, weighted by its priority, and budget that fields and short sections leave unused goes
+        to the highest-priority sections that were cut off.
+
+        A section's slice therefore only depends on other sections when a higher-priority section
+        does not fit its share. That keeps fingerprints stable for most small edits, and where the
+        two conflict a full prompt is worth more than reusing an analysis.
+        """
+        document = self._as_document(resume_content)
+        config = self.analysis_prompts[analysis_type]
+        fields = {}
+        available = config['token_budget']
+        for field, cap in config['fields'].items():
+            value = self._fit_field(field, self._ranked_field(document, field), cap)
+            if value:
+                fields[field] = value
+                available -= estimate_tokens(f"{self._field_labels[field]}: {json.dumps(value, separators=(',', ':'))}") + 1
+
+        sections = document.section_names
+        names = [name for name in config['sections'] if name in sections]
+        if not names:
+            # Fall back to the remaining detected sections, or the raw text if none were found
+            names = [name for name in sections if name != 'general'] or list(sections)
+        section_lines = {name: document.section_lines(name) for name in names} or {'resume': [document.text]}
+        available -= sum(estimate_tokens(self._section_label(name)) + 1 for name in section_lines)
+        available = max(available, 0)
+
+        weights = [0.5 ** rank for rank in range(len(section_lines))]
+        selected = {}
+        used = {}
+        for name, weight in zip(section_lines, weights):
+            selected[name], used[name] = self._select_section_lines(
+                section_lines[name], int(available * weight / sum(weights))
+            )
+        leftover = available - sum(used.values())
+        for name, lines in section_lines.items():
+            if leftover <= 0:
+                break
+            if selected[name] != lines:
+                grown, grown_used = self._select_section_lines(lines, used[name] + leftover)
+                leftover -= grown_used - used[name]
+                selected[name], used[name] = grown, grown_used
+        return {'fields': fields, 'sections': {name: lines for name, lines in selected.items() if lines}}
+
+    def _section_label(self, name: str) -> str:
+        return f"{name.replace('_', ' ').title()}:"
+
+    def build_resume_context(self, resume_content: ResumeContent, analysis_type: str) -> str:
+        """
+        Assemble the resume part of an analysis prompt within the analysis type's token budget:
+        its structured fields as compact JSON, then its most relevant sections instead of the
+        start of the raw text.
+        """
+        inputs = self.analysis_inputs(resume_content, analysis_type)
+        parts = [
+            f"{self._field_labels[field]}: {json.dumps(value, separators=(',', ':'))}"
+            for field, value in inputs['fields'].items()
+        ]
+        parts.extend(
+            self._section_label(name) + '\n' + '\n'.join(lines)
+            for name, lines in inputs['sections'].items()
+        )
+        return '\n'.join(parts)
+
+    def build_analysis_messages(self, resume_content: ResumeContent, analysis_type: str) -> List[Any]:
+        """Build the chat messages sent to the LLM for one analysis type."""
+        config = self.analysis_prompts[analysis_type]
+        return [
+            SystemMessage(content=_compact_whitespace(self.analysis_system_message)),
+            UserMessage(content=_compact_whitespace(f"""Analyze this professional profile:
+                            {self.build_resume_context(resume_content, analysis_type)}
+                            Analysis Request:
+                            {config['prompt']}
+                            Format your response in clear paragraphs with line breaks between main points."""))
+        ]
+
+    def count_prompt_tokens(self, messages: List[Any]) -> int:
+        """Estimated input tokens for a list of chat messages."""
+        return sum(estimate_tokens(message.content) for message in messages)
+
+    def _fingerprint(self, value: Any) -> str:
+        """Stable short hash of a JSON-serializable value."""
+        if not isinstance(value, str):
+            value = json.dumps(value, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(value.encode('utf-8')).hexdigest()[:16]
+
+    def fingerprint_resume_content(self, resume_content: ResumeContent) -> Dict[str, Any]:
+        """
+        Fingerprint processed resume content per section, per extracted field and per
+        analysis. An analysis fingerprint combines the fingerprints of the section slices and
+        field values that analysis sends (see analysis_inputs) with its prompt settings and the
+        model, so it only changes when the LLM would actually see different input.
+        """
+        document = self._as_document(resume_content)
+        analyses = {}
+        for analysis_type, config in self.analysis_prompts.items():
+            inputs = self.analysis_inputs(document, analysis_type)
+            analyses[analysis_type] = self._fingerprint({
+                'model': self.analysis_model,
+                'system_message': self.analysis_system_message,
+                'config': config,
+                'sections': {name: self._fingerprint(lines) for name, lines in inputs['sections'].items()},
+                'fields': {field: self._fingerprint(value) for field, value in inputs['fields'].items()}
+            })
+        return {
+            'sections': {
+                section: self._fingerprint(document.section_lines(section))
+                for section in document.section_names
+            },
+            'skills': self._fingerprint(self._prompt_skills(document)),
+            'metrics': self._fingerprint(document.metrics()),
+            'dates': self._fingerprint(document.dates()),
+            'analyses': analyses
+        }
+
+    def diff_fingerprints(self, previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, List[str]]:
+        """Summarize which sections and extracted fields changed between two fingerprints."""
+        previous_sections = previous.get('sections', {})
+        current_sections = current.get('sections', {})
+        return {
+            'added_sections': sorted(set(current_sections) - set(previous_sections)),
+            'removed_sections': sorted(set(previous_sections) - set(current_sections)),
+            'changed_sections': sorted(
+                section for section in set(current_sections) & set(previous_sections)
+                if current_sections[section] != previous_sections[section]
+            ),
+            'unchanged_sections': sorted(
+                section for section in set(current_sections) & set(previous_sections)
+                if current_sections[section] == previous_sections[section]
+            ),
+            'changed_fields': [
+                field for field in ('skills', 'metrics', 'dates')
+                if previous.get(field) != current.get(field)
+            ]
+        }
+
+    async def get_ai_analysis(
+        self,
+        resume_content: ResumeContent,
+        previous_result: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate comprehensive AI analysis with improved prompts for deeper insights.
+        When `previous_result` (an earlier return value of this method for a prior
+        version of the resume) is given, analyses whose input fingerprint is unchanged
+        are reused instead of being sent to the LLM again.
+        """
+        try:
+            if not resume_content or not isinstance(resume_content, (dict, ResumeDocument)):
+                raise ValueError("Invalid resume content provided")
+            if self.client is None:
+                raise ValueError("AI analysis requires a Mistral API key")
+            document = self._as_document(resume_content)
+            analyses = {analysis_type: '' for analysis_type in self.analysis_prompts}
+            fingerprints = self.fingerprint_resume_content(document)
+            # Only successful analyses keep their fingerprint, so failures are never reused
+            completed_fingerprints = {}
+            previous_fingerprints = {}
+            previous_analyses = {}
+            if previous_result:
+                previous_fingerprints = previous_result.get('fingerprints', {})
+                previous_analyses = previous_result.get('analysis', {})
+            reused = []
+            token_usage = {}
+
+            for analysis_type, config in self.analysis_prompts.items():
+                analysis_fingerprint = fingerprints['analyses'][analysis_type]
+                if (previous_fingerprints.get('analyses', {}).get(analysis_type) == analysis_fingerprint
+                        and previous_analyses.get(analysis_type)):
+                    analyses[analysis_type] = previous_analyses[analysis_type]
+                    completed_fingerprints[analysis_type] = analysis_fingerprint
+                    reused.append(analysis_type)
+                    continue
+
                 max_retries = 2
                 retry_count = 0
                 while retry_count <= max_retries:
                     try:
                         # Use a safer approach to get text from resume_content
-                        raw_text = resume_content.get('raw_text', '')
-                        if not raw_text:
+                        if not document.text:
                             analyses[analysis_type] = "No resume text available for analysis."
                             break
                             
-                        resume_summary = {
-                            'text': raw_text[:2000],  # Limit to 2000 chars
-                            'skills': resume_content.get('skills', {}),
-                            'metrics': resume_content.get('metrics', []),
-                            'dates': resume_content.get('dates', [])
-                        }
-                        
-                        system_message = """You are an expert career advisor and resume analyst. 
-                        Provide detailed, actionable insights based on the resume content.
-                        Focus on specific examples and concrete recommendations.
-                        Format your response in clear paragraphs with line breaks between main points."""
-                        
-                        messages = [
-                            SystemMessage(content=system_message),
-                            UserMessage(content=f"""Analyze this professional profile:
-                            Resume Content:
-                            {resume_summary['text']}
-                            Professional Skills:
-                            {json.dumps(resume_summary['skills'], indent=2)}
-                            Career Timeline:
-                            {json.dumps(resume_summary['dates'], indent=2)}
-                            Key Metrics:
-                            {json.dumps(resume_summary['metrics'], indent=2)}
-                            Analysis Request:
-                            {config['prompt']}
-                            Format your response in clear paragraphs with line breaks between main points.""")
-                        ]
+                        messages = self.build_analysis_messages(document, analysis_type)
+                        token_usage[analysis_type] = {'estimated_prompt_tokens': self.count_prompt_tokens(messages)}
                         
                         response = await asyncio.wait_for(
                             self.client.chat.complete_async(
-                                model="mistral-medium",
+                                model=self.analysis_model,
                                 messages=messages,
                                 temperature=0.7,
                                 max_tokens=1000
@@ -366,6 +822,11 @@ class EnhancedResumeAnalyzer:
                         )
                         
                         analyses[analysis_type] = response.choices[0].message.content
+                        usage = getattr(response, 'usage', None)
+                        if usage is not None:
+                            token_usage[analysis_type]['prompt_tokens'] = usage.prompt_tokens
+                            token_usage[analysis_type]['completion_tokens'] = usage.completion_tokens
+                        completed_fingerprints[analysis_type] = analysis_fingerprint
                         break
                     except asyncio.TimeoutError:
                         retry_count += 1
@@ -382,173 +843,191 @@ class EnhancedResumeAnalyzer:
                         
             if not any(analyses.values()):
                 raise ValueError("No analyses could be completed")
-                
-            return {
+
+            fingerprints['analyses'] = completed_fingerprints
+            result = {
                 "analysis": analyses,
-                "extracted_content": resume_content
+                "extracted_content": document.to_dict(),
+                "fingerprints": fingerprints,
+                "token_usage": token_usage,
+                # Analyses that hold an error or timeout message instead of a result
+                "failed_analyses": [
+                    analysis_type for analysis_type in analyses if analysis_type not in completed_fingerprints
+                ]
             }
+            if previous_result:
+                diff = self.diff_fingerprints(previous_fingerprints, fingerprints)
+                diff['reused_analyses'] = reused
+                diff['recomputed_analyses'] = [
+                    analysis_type for analysis_type in self.analysis_prompts if analysis_type not in reused
+                ]
+                result["diff"] = diff
+            return result
         except Exception as e:
             print(f"Error in AI analysis: {str(e)}\n{traceback.format_exc()}")
             raise
     
-def calculate_ats_score(self, resume_content: Dict[str, Any]) -> float:
-    """
-    Calculate an ATS score using industry-standard criteria with adjusted weighting.
-    Returns a realistic score between 55-80 based on content quality.
-    """
-    try:
-        if not resume_content or not isinstance(resume_content, dict):
-            print("Invalid resume content provided for ATS scoring.")
-            return 65.0  # Default fallback score now in target range
+    def calculate_ats_score(self, resume_content: ResumeContent) -> float:
+        """
+        Calculate an ATS score using industry-standard criteria with adjusted weighting.
+        Returns a realistic score between 55-80 based on content quality.
+        """
+        try:
+            if not resume_content or not isinstance(resume_content, (dict, ResumeDocument)):
+                print("Invalid resume content provided for ATS scoring.")
+                return 65.0  # Default fallback score now in target range
         
-        # Ensure raw_text exists and is not empty
-        raw_text = resume_content.get('raw_text', '')
-        if not raw_text:
-            print("No raw text found in resume content.")
-            return 65.0  # Default fallback score now in target range
+            # Ensure raw_text exists and is not empty
+            document = self._as_document(resume_content)
+            raw_text = document.text
+            if not raw_text:
+                print("No raw text found in resume content.")
+                return 65.0  # Default fallback score now in target range
         
-        raw_text = raw_text.lower()
-        sections = resume_content.get('sections', {})
+            # A short-lived lowercase copy: matching it is much faster than re.IGNORECASE
+            raw_text = raw_text.lower()
+            sections = document.section_names
         
-        # FACTOR 1: KEYWORD MATCHING (30% of score)
-        keyword_score = 0
-        total_keywords = len(self.industry_keywords)
-        matched_keywords = 0
+            # FACTOR 1: KEYWORD MATCHING (30% of score)
+            keyword_score = 0
+            total_keywords = len(self.industry_keywords)
+            matched_keywords = 0
         
-        # Count how many industry keywords are found in the resume
-        for keyword in self.industry_keywords:
-            # Use word boundary to ensure we're matching complete words
-            if re.search(r'\b' + re.escape(keyword) + r'\b', raw_text):
-                matched_keywords += 1
+            # Count how many industry keywords are found in the resume
+            words = set(re.findall(r'\w+', raw_text))
+            for keyword, keyword_regex in zip(self.industry_keywords, self._keyword_regexes):
+                # Use word boundary to ensure we're matching complete words
+                if keyword in words if keyword_regex is None else keyword_regex.search(raw_text):
+                    matched_keywords += 1
         
-        # Calculate keyword score based on percentage of matched keywords
-        keyword_match_percentage = matched_keywords / total_keywords if total_keywords > 0 else 0
-        keyword_score = min(30 * keyword_match_percentage, 30)
+            # Calculate keyword score based on percentage of matched keywords
+            keyword_match_percentage = matched_keywords / total_keywords if total_keywords > 0 else 0
+            keyword_score = min(30 * keyword_match_percentage, 30)
         
-        # Add a base score to avoid too low values
-        if keyword_score < 15:
-            keyword_score = 15 + (keyword_score / 2)
+            # Add a base score to avoid too low values
+            if keyword_score < 15:
+                keyword_score = 15 + (keyword_score / 2)
         
-        # FACTOR 2: RESUME STRUCTURE (20% of score)
-        structure_score = 0
-        essential_sections = ['experience', 'education', 'skills']
-        important_sections = ['summary', 'projects', 'certifications']
+            # FACTOR 2: RESUME STRUCTURE (20% of score)
+            structure_score = 0
+            essential_sections = ['experience', 'education', 'skills']
+            important_sections = ['summary', 'projects', 'certifications']
         
-        # Check for essential sections (12%)
-        for section in essential_sections:
-            if section in sections:
-                structure_score += 4  # Adjusted weight
+            # Check for essential sections (12%)
+            for section in essential_sections:
+                if section in sections:
+                    structure_score += 4  # Adjusted weight
         
-        # Check for important sections (8%)
-        for section in important_sections:
-            if section in sections:
-                structure_score += 2.67  # Adjusted weight to total 8%
+            # Check for important sections (8%)
+            for section in important_sections:
+                if section in sections:
+                    structure_score += 2.67  # Adjusted weight to total 8%
         
-        # Cap structure score at 20
-        structure_score = min(structure_score, 20)
+            # Cap structure score at 20
+            structure_score = min(structure_score, 20)
         
-        # Ensure minimum structure score
-        structure_score = max(structure_score, 10)
+            # Ensure minimum structure score
+            structure_score = max(structure_score, 10)
         
-        # FACTOR 3: EXPERIENCE & EDUCATION QUALITY (20% of score)
-        quality_score = 0
+            # FACTOR 3: EXPERIENCE & EDUCATION QUALITY (20% of score)
+            quality_score = 0
         
-        # Check for quantifiable metrics (up to 12%)
-        metrics = resume_content.get('metrics', [])
-        if not isinstance(metrics, list):
-            metrics = []
+            # Check for quantifiable metrics (up to 12%)
+            metrics = document.metrics()
         
-        # More granular scoring based on number of metrics
-        if len(metrics) >= 5:
-            quality_score += 12  # Full points for 5+ metrics
-        elif len(metrics) > 0:
-            quality_score += 6 + (len(metrics) * 1.5)  # Scale based on count with higher base
-        else:
-            quality_score += 6  # Higher base score
+            # More granular scoring based on number of metrics
+            if len(metrics) >= 5:
+                quality_score += 12  # Full points for 5+ metrics
+            elif len(metrics) > 0:
+                quality_score += 6 + (len(metrics) * 1.5)  # Scale based on count with higher base
+            else:
+                quality_score += 6  # Higher base score
         
-        # Check for detailed dates (up to 8%)
-        dates = resume_content.get('dates', [])
-        if not isinstance(dates, list):
-            dates = []
+            # Check for detailed dates (up to 8%)
+            dates = document.dates()
             
-        if len(dates) >= 4:
-            quality_score += 8  # Full points for 4+ date references
-        elif len(dates) > 0:
-            quality_score += 4 + (len(dates))  # Scale based on count with higher base
-        else:
-            quality_score += 4  # Higher base score
+            if len(dates) >= 4:
+                quality_score += 8  # Full points for 4+ date references
+            elif len(dates) > 0:
+                quality_score += 4 + (len(dates))  # Scale based on count with higher base
+            else:
+                quality_score += 4  # Higher base score
         
-        # Cap quality score at 20
-        quality_score = min(quality_score, 20)
+            # Cap quality score at 20
+            quality_score = min(quality_score, 20)
         
-        # FACTOR 4: FORMATTING & READABILITY (15% of score)
-        format_score = 0
+            # FACTOR 4: FORMATTING & READABILITY (15% of score)
+            format_score = 0
         
-        # Check resume length (5%)
-        word_count = len(raw_text.split())
-        if word_count >= 500:
-            format_score += 5  # Ideal length
-        elif word_count >= 300:
-            format_score += 4
-        elif word_count >= 200:
-            format_score += 3.5
-        else:
-            format_score += 3  # Too short but higher minimum
+            # Check resume length (5%)
+            word_count = document.word_count()
+            if word_count >= 500:
+                format_score += 5  # Ideal length
+            elif word_count >= 300:
+                format_score += 4
+            elif word_count >= 200:
+                format_score += 3.5
+            else:
+                format_score += 3  # Too short but higher minimum
         
-        # Check for clean section formatting (5%)
-        if len(sections) >= 5:
-            format_score += 5  # Comprehensive sections
-        elif len(sections) >= 3:
-            format_score += 4
-        else:
-            format_score += 3  # Poor sectioning but higher minimum
+            # Check for clean section formatting (5%)
+            if len(sections) >= 5:
+                format_score += 5  # Comprehensive sections
+            elif len(sections) >= 3:
+                format_score += 4
+            else:
+                format_score += 3  # Poor sectioning but higher minimum
         
-        # Check for bullet points (5%)
-        bullet_pattern = r'^\s*[•\-*]\s'
-        bullets = re.findall(bullet_pattern, raw_text, re.MULTILINE)
-        if len(bullets) >= 10:
-            format_score += 5  # Well-formatted with bullets
-        elif len(bullets) >= 5:
-            format_score += 4
-        elif len(bullets) > 0:
-            format_score += 3
-        else:
-            format_score += 2  # No bullet formatting but higher minimum
+            # Check for bullet points (5%)
+            bullet_pattern = r'^\s*[•\-*]\s'
+            bullets = re.findall(bullet_pattern, raw_text, re.MULTILINE)
+            if len(bullets) >= 10:
+                format_score += 5  # Well-formatted with bullets
+            elif len(bullets) >= 5:
+                format_score += 4
+            elif len(bullets) > 0:
+                format_score += 3
+            else:
+                format_score += 2  # No bullet formatting but higher minimum
         
-        # BASE SCORE (15% of total)
-        # Add a fixed base score to shift all results higher
-        base_score = 15
+            # BASE SCORE (15% of total)
+            # Add a fixed base score to shift all results higher
+            base_score = 15
         
-        # Calculate final score (100 point scale)
-        final_score = keyword_score + structure_score + quality_score + format_score + base_score
+            # Calculate final score (100 point scale)
+            final_score = keyword_score + structure_score + quality_score + format_score + base_score
         
-        # Add small variance for natural distribution
-        import random
-        # Smaller variance to keep within target range
-        variation = random.uniform(-1.0, 1.0)
-        final_score += variation
+            # Add small variance for natural distribution
+            import random
+            # Smaller variance to keep within target range
+            variation = random.uniform(-1.0, 1.0)
+            final_score += variation
         
-        # Ensure score is between 55-80 with soft clamping to avoid too many edge scores
-        if final_score < 55:
-            # Soft clamping for scores below range
-            adjustment = (55 - final_score) * 0.8
-            final_score += adjustment
-        elif final_score > 80:
-            # Soft clamping for scores above range
-            adjustment = (final_score - 40) * 0.8
-            final_score -= adjustment
+            # Ensure score is between 55-80 with soft clamping to avoid too many edge scores
+            if final_score < 55:
+                # Soft clamping for scores below range
+                adjustment = (55 - final_score) * 0.8
+                final_score += adjustment
+            elif final_score > 80:
+                # Soft clamping for scores above range
+                adjustment = (final_score - 40) * 0.8
+                final_score -= adjustment
             
-        # Ensure absolute limits
-        final_score = max(min(final_score, 80), 55)
+            # Ensure absolute limits
+            final_score = max(min(final_score, 80), 55)
         
-        # Round to nearest tenth
-        return round(final_score, 1)
+            # Round to nearest tenth
+            return round(final_score, 1)
         
-    except Exception as e:
-        print(f"Error calculating ATS score: {str(e)}\n{traceback.format_exc()}")
-        return 65.0  # Return a moderate default score in target range
-            
-async def analyze_resume(self, file_path: str) -> Dict[str, Any]:
+        except Exception as e:
+            print(f"Error calculating ATS score: {str(e)}\n{traceback.format_exc()}")
+            return 65.0  # Return a moderate default score in target range
+
+    async def analyze_resume(
+        self,
+        file_path: str,
+        previous_result: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """Perform comprehensive resume analysis with detailed insights."""
         try:
             with open(file_path, 'rb') as file:
@@ -560,12 +1039,16 @@ async def analyze_resume(self, file_path: str) -> Dict[str, Any]:
                 raise ValueError(f"Unsupported file type: {file_extension}. Only PDF files are supported.")
                 
             raw_text = self.extract_text_from_pdf(file_content)
-            processed_content = self.process_resume_content(raw_text)
-            analysis = await self.get_ai_analysis(processed_content)
-            ats_score = self.calculate_ats_score(processed_content)
+            document = self.parse_resume(raw_text)
+            analysis = await self.get_ai_analysis(document, previous_result)
+            ats_score = self.calculate_ats_score(document)
             return {
                 "analysis": analysis["analysis"],
-                "extracted_content": processed_content,
+                "extracted_content": analysis["extracted_content"],
+                "fingerprints": analysis["fingerprints"],
+                "diff": analysis.get("diff"),
+                "token_usage": analysis["token_usage"],
+                "failed_analyses": analysis["failed_analyses"],
                 "ats_score": ats_score,
                 "timestamp": datetime.now().isoformat(),
                 "version": "2.0.0"
@@ -573,35 +1056,323 @@ async def analyze_resume(self, file_path: str) -> Dict[str, Any]:
         except Exception as e:
             print(f"Error in resume analysis: {e}")
             raise
-            
-async def main():
-    """Main function with enhanced error handling and output formatting."""
+
+
+class AnalysisStore:
+    """
+    Keeps AI analysis results on disk so revised uploads can reuse them. Results older
+    than `max_age_days` are treated as missing and deleted by cleanup(), which runs when
+    the store is created and at most once an hour when saving.
+    """
+
+    def __init__(self, directory: str, max_age_days: float = 30):
+        self.directory = directory
+        self.max_age = max_age_days * 24 * 3600
+        os.makedirs(directory, exist_ok=True)
+        self._last_cleanup = 0.0
+        self.cleanup()
+
+    def _path(self, analysis_id: str) -> Optional[str]:
+        if not re.fullmatch(r'[0-9a-f]{32}', analysis_id or ''):
+            return None
+        return os.path.join(self.directory, f"{analysis_id}.json")
+
+    def save(self, result: Dict[str, Any]) -> str:
+        """Store the analyses and fingerprints of a result and return its id."""
+        analysis_id = uuid.uuid4().hex
+        path = self._path(analysis_id)
+        # Write to a temporary file first so an interrupted save never leaves a truncated result
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({
+                "analysis": result.get("analysis", {}),
+                "fingerprints": result.get("fingerprints", {}),
+                "timestamp": datetime.now().isoformat()
+            }, f)
+        os.replace(path + '.tmp', path)
+        if time.time() - self._last_cleanup > 3600:
+            self.cleanup()
+        return analysis_id
+
+    def load(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """Return a stored result, or None if the id is unknown, expired or unreadable."""
+        path = self._path(analysis_id)
+        try:
+            if not path or os.path.getmtime(path) < time.time() - self.max_age:
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error loading stored analysis {analysis_id}: {e}")
+            return None
+
+    def cleanup(self) -> int:
+        """Delete stored results older than the maximum age and return how many were removed."""
+        cutoff = time.time() - self.max_age
+        removed = 0
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                # Already removed by another process
+                continue
+        self._last_cleanup = time.time()
+        return removed
+
+# Per-process analyzer used by the batch extraction workers
+_worker_analyzer: Optional[EnhancedResumeAnalyzer] = None
+
+def _raise_extraction_timeout(signum, frame) -> None:
+    raise TimeoutError("timed out")
+
+def _init_worker() -> None:
+    """Create the worker's analyzer and keep its diagnostics off the JSONL stream."""
+    global _worker_analyzer
+    sys.stdout = sys.stderr
+    _worker_analyzer = EnhancedResumeAnalyzer()
+    if hasattr(signal, 'SIGALRM'):
+        signal.signal(signal.SIGALRM, _raise_extraction_timeout)
+
+def _extract_resume(pdf_path: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Run the deterministic stages (extraction, parsing, ATS scoring) on one PDF.
+    A `timeout` in seconds interrupts text extraction and parsing that take too long, so
+    one pathological PDF cannot hold the worker; this needs SIGALRM, so there is no limit
+    on Windows.
+    """
+    use_alarm = bool(timeout) and hasattr(signal, 'setitimer')
     try:
-        mistral_api_key = "YOUR_MISTRAL_API_KEY"
-        if not mistral_api_key:
-            raise ValueError("MISTRAL_API_KEY environment variable not set")
-        analyzer = EnhancedResumeAnalyzer(mistral_api_key)
-        pdf_path = "Resume.pdf"
-        if not os.path.exists(pdf_path):
-            raise FileNotFoundError(f"Resume file not found: {pdf_path}")
-        print("\nAnalyzing resume... This may take a few moments.\n")
-        results = await analyzer.analyze_resume(pdf_path)
-        print("\n=== Career Development Analysis ===\n")
-        print(results["analysis"]["career_trajectory"])
-        print("\n=== Skills Assessment ===\n")
-        print(results["analysis"]["skills_analysis"])
-        print("\n=== Resume Optimization Recommendations ===\n")
-        print(results["analysis"]["resume_optimization"])
-        print("\n=== Action Plan ===\n")
-        print(results["analysis"]["action_plan"])
-        print(f"\n=== ATS Score ===\nATS Score: {results.get('ats_score', 'N/A')}%")
-        output_file = f"resume_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(output_file, 'w') as f:
-            json.dump(results, f, indent=2)
-        print(f"\nDetailed analysis saved to: {output_file}")
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        with open(pdf_path, 'rb') as file:
+            file_content = file.read()
+        raw_text = _worker_analyzer.extract_text_from_pdf(file_content)
+        if not raw_text:
+            raise ValueError("No text could be extracted from the PDF")
+        document = _worker_analyzer.parse_resume(raw_text)
+        if use_alarm:
+            # Stop before ATS scoring, which would swallow the timeout into a default score
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        # Ship the compact document back; the dict is only built when the record is written
+        return {
+            "file": pdf_path,
+            "document": document,
+            "ats_score": _worker_analyzer.calculate_ats_score(document)
+        }
+    except TimeoutError:
+        return {"file": pdf_path, "error": f"Extraction timed out after {timeout:g}s"}
     except Exception as e:
-        print(f"Error: {e}")
-        raise
+        return {"file": pdf_path, "error": f"Extraction failed: {str(e)}"}
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+def collect_pdf_paths(inputs: List[str]) -> List[str]:
+    """Expand directories and glob patterns into a sorted, de-duplicated list of PDF paths."""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, '**', '*'), recursive=True)
+        else:
+            matches = glob.glob(item, recursive=True)
+        for match in matches:
+            if os.path.isfile(match) and os.path.splitext(match)[1].lower() == '.pdf':
+                paths.add(os.path.abspath(match))
+    return sorted(paths)
+
+def batch_mode(use_llm: bool) -> str:
+    """Name of the batch mode a checkpoint is written in."""
+    return 'llm' if use_llm else 'no-llm'
+
+def load_checkpoint(checkpoint_path: Optional[str], mode: str) -> Tuple[set, Dict[str, int]]:
+    """
+    Return the PDF paths a checkpoint records as processed, and the number of failed
+    attempts for each path that has not succeeded yet. Checkpoints start with a "mode"
+    line; resuming one written in another mode raises ValueError, since its entries did
+    not go through the same stages.
+    """
+    failures = defaultdict(int)
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return set(), dict(failures)
+    completed = set()
+    checkpoint_mode = None
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            key, _, value = line.rstrip('\n').partition('\t')
+            if key == 'mode':
+                checkpoint_mode = value
+            elif key == 'done':
+                completed.add(value)
+            elif key == 'failed':
+                failures[value] += 1
+            else:
+                raise ValueError(f"Unrecognized line in checkpoint {checkpoint_path}: {line.strip()}")
+    if completed and checkpoint_mode is None:
+        raise ValueError(f"Checkpoint {checkpoint_path} does not record which mode wrote it")
+    if checkpoint_mode is not None and checkpoint_mode != mode:
+        raise ValueError(
+            f"Checkpoint {checkpoint_path} was written by a {checkpoint_mode} run; "
+            f"use a separate checkpoint file for {mode} runs"
+        )
+    return completed, {path: count for path, count in failures.items() if path not in completed}
+
+async def run_batch(
+    pdf_paths: List[str],
+    output,
+    checkpoint=None,
+    mistral_api_key: Optional[str] = None,
+    workers: Optional[int] = None,
+    concurrency: int = 4,
+    use_llm: bool = True,
+    extract_timeout: Optional[float] = 20.0
+) -> Dict[str, int]:
+    """
+    Analyze many resumes, writing one JSON line per resume as soon as it finishes.
+    PDF extraction is spread across a process pool; LLM analysis is capped at
+    `concurrency` resumes in flight, and extracting one PDF is limited to
+    `extract_timeout` seconds. Each path is appended to `checkpoint` as done or
+    failed after its result line has been flushed; failures are written to `output`
+    with an "error" field, and a re-run retries them. A new checkpoint starts with
+    the run's mode (see load_checkpoint).
+    """
+    workers = workers or os.cpu_count() or 1
+    analyzer = EnhancedResumeAnalyzer(mistral_api_key) if use_llm else None
+    if checkpoint is not None and checkpoint.tell() == 0:
+        checkpoint.write(f"mode\t{batch_mode(use_llm)}\n")
+        checkpoint.flush()
+    llm_slots = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    stats = {"processed": 0, "failed": 0}
+
+    async def process(pool: ProcessPoolExecutor, pdf_path: str) -> None:
+        record = await loop.run_in_executor(pool, _extract_resume, pdf_path, extract_timeout)
+        document = record.pop("document", None)
+        if use_llm and document is not None:
+            try:
+                async with llm_slots:
+                    analysis = await analyzer.get_ai_analysis(document)
+                record["analysis"] = analysis["analysis"]
+                record["token_usage"] = analysis["token_usage"]
+                if analysis["failed_analyses"]:
+                    record["error"] = f"AI analysis failed for: {', '.join(analysis['failed_analyses'])}"
+            except Exception as e:
+                record["error"] = f"AI analysis failed: {str(e)}"
+        if document is not None:
+            record["extracted_content"] = document.to_dict()
+        record["timestamp"] = datetime.now().isoformat()
+        record["version"] = "2.0.0"
+
+        output.write(json.dumps(record) + '\n')
+        output.flush()
+        # Failed resumes are only counted, so a re-run retries them up to --max-attempts
+        if checkpoint is not None:
+            checkpoint.write(f"{'failed' if 'error' in record else 'done'}\t{pdf_path}\n")
+            checkpoint.flush()
+        stats["failed" if "error" in record else "processed"] += 1
+        done = stats["processed"] + stats["failed"]
+        if done % 100 == 0:
+            print(f"Processed {done}/{len(pdf_paths)} resumes", file=sys.stderr)
+
+    # Bound the number of in-flight resumes so huge directories don't queue everything at once
+    max_in_flight = workers * 2 + (concurrency if use_llm else 0)
+    pending = set()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        try:
+            for pdf_path in pdf_paths:
+                if len(pending) >= max_in_flight:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        # Per-resume problems are recorded inside process(); anything raised here
+                        # (a broken pool, a failed write) means the run itself cannot continue
+                        task.result()
+                pending.add(asyncio.create_task(process(pool, pdf_path)))
+            if pending:
+                await asyncio.gather(*pending)
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+    return stats
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Analyze a directory or glob of resume PDFs and stream JSON lines."
+    )
+    parser.add_argument('inputs', nargs='+', help="PDF files, directories or glob patterns")
+    parser.add_argument('-o', '--output', default='-',
+                        help="JSONL output file, appended to (default: stdout)")
+    parser.add_argument('--checkpoint',
+                        help="File recording finished paths; analyzed resumes are skipped on restart, failed ones are retried")
+    parser.add_argument('--max-attempts', type=int, default=3,
+                        help="Runs that may fail on a resume before restarts stop retrying it (default: 3)")
+    parser.add_argument('--extract-timeout', type=float, default=20.0,
+                        help="Seconds allowed for extracting one PDF (default: 20)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Extraction processes (default: CPU count)")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="Maximum resumes in LLM analysis at once (default: 4)")
+    parser.add_argument('--no-llm', action='store_true',
+                        help="Only run extraction, parsing and ATS scoring")
+    parser.add_argument('--api-key', default=os.getenv("MISTRAL_API_KEY"),
+                        help="Mistral API key (default: MISTRAL_API_KEY environment variable)")
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.max_attempts < 1:
+        parser.error("--max-attempts must be at least 1")
+    if args.extract_timeout <= 0:
+        parser.error("--extract-timeout must be positive")
+    if not args.no_llm and not args.api_key:
+        parser.error("MISTRAL_API_KEY environment variable not set (pass --api-key, or --no-llm)")
+    return args
+
+async def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point for batch resume analysis."""
+    args = parse_args(argv)
+    use_llm = not args.no_llm
+
+    pdf_paths = collect_pdf_paths(args.inputs)
+    try:
+        completed, failures = load_checkpoint(args.checkpoint, batch_mode(use_llm))
+    except ValueError as e:
+        raise SystemExit(f"error: {e}")
+    given_up = [path for path in pdf_paths if failures.get(path, 0) >= args.max_attempts]
+    remaining = [path for path in pdf_paths if path not in completed and path not in given_up]
+    print(f"Found {len(pdf_paths)} PDFs, {len(pdf_paths) - len(remaining) - len(given_up)} already processed",
+          file=sys.stderr)
+    if given_up:
+        print(f"Skipping {len(given_up)} PDFs that failed {args.max_attempts} times "
+              f"(raise --max-attempts to retry them)", file=sys.stderr)
+
+    # Keep incidental prints on stderr so stdout only carries JSON lines
+    with ExitStack() as stack:
+        if args.output == '-':
+            output = sys.stdout
+        else:
+            output = stack.enter_context(open(args.output, 'a', encoding='utf-8'))
+        checkpoint = None
+        if args.checkpoint:
+            checkpoint = stack.enter_context(open(args.checkpoint, 'a', encoding='utf-8'))
+        stack.enter_context(redirect_stdout(sys.stderr))
+        stats = await run_batch(
+            remaining,
+            output,
+            checkpoint=checkpoint,
+            mistral_api_key=args.api_key if use_llm else None,
+            workers=args.workers,
+            concurrency=args.concurrency,
+            use_llm=use_llm,
+            extract_timeout=args.extract_timeout
+        )
+    print(f"Done: {stats['processed']} analyzed, {stats['failed']} failed", file=sys.stderr)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,241 @@
+"""
+The dict-of-lists resume processing and ATS scoring that ResumeDocument replaced.
+
+Kept as the reference output for the parity tests and as the baseline row of
+bench_memory.py. Each function takes the analyzer for its configured patterns and
+keywords; nothing in the request path uses this module.
+"""
+import random
+import re
+import traceback
+from collections import defaultdict
+from typing import Any, Dict, List
+
+
+def identify_section(analyzer, text: str) -> str:
+    """Identify resume section based on pattern matching."""
+    text_lower = text.lower()
+    for section, patterns in analyzer.section_patterns.items():
+        if any(pattern in text_lower for pattern in patterns):
+            return section
+    return None
+
+
+def count_sentences(text: str) -> int:
+    """Simple sentence counter using regular expressions."""
+    if not text:
+        return 0
+    return len(re.split(r'[.!?]+', text))
+
+
+def extract_dates(text: str) -> List[str]:
+    """Extract dates from text."""
+    if not text:
+        return []
+
+    date_patterns = [
+        r'\b\d{4}\b',
+        r'\b(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\s+\d{4}\b',
+        r'\d{1,2}/\d{1,2}/\d{2,4}',
+        r'\d{1,2}-\d{1,2}-\d{2,4}'
+    ]
+
+    dates = []
+    for pattern in date_patterns:
+        dates.extend(re.findall(pattern, text, re.IGNORECASE))
+    return sorted(list(set(dates)))
+
+
+def extract_metrics(text: str) -> List[str]:
+    """Extract metrics and achievements with numbers."""
+    if not text:
+        return []
+
+    metric_patterns = [
+        r'\$\s*\d+(?:,\d{3})*(?:\.\d{2})?(?:\s*(?:million|billion|k))?',
+        r'\d+(?:,\d{3})*%',
+        r'\d+(?:,\d{3})*\+?\s*(?:users|customers|clients|employees|people|projects|years)'
+    ]
+
+    metrics = []
+    for pattern in metric_patterns:
+        metrics.extend(re.findall(pattern, text, re.IGNORECASE))
+    return sorted(list(set(metrics)))
+
+
+def categorize_skills(analyzer, text: str) -> dict:
+    """Categorize skills using regex pattern matching."""
+    if not text:
+        return {}
+
+    text_lower = text.lower()
+    found_skills = defaultdict(lambda: defaultdict(set))
+    for main_category, subcategories in analyzer.skill_categories.items():
+        for subcategory, keywords in subcategories.items():
+            for keyword in keywords:
+                pattern = rf'\b{re.escape(keyword)}\b(?:[,\s]+(?:\w+\s+){{0,3}}\w+)*'
+                matches = re.finditer(pattern, text_lower)
+                for match in matches:
+                    found_skills[main_category][subcategory].add(match.group().strip())
+    return {
+        category: {
+            subcat: sorted(list(skills))
+            for subcat, skills in subcategories.items()
+            if skills  # Only include non-empty skill sets
+        }
+        for category, subcategories in found_skills.items()
+    }
+
+
+def process_resume_content(analyzer, text: str) -> dict:
+    """Process resume content with lightweight section detection and analysis."""
+    if not text:
+        return {
+            'raw_text': '',
+            'sections': {},
+            'skills': {},
+            'metrics': [],
+            'dates': [],
+            'section_statistics': {}
+        }
+
+    sections = defaultdict(list)
+    current_section = None
+    section_text = []
+    lines = text.split('\n')
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        detected_section = identify_section(analyzer, line)
+        if detected_section:
+            if current_section and section_text:
+                sections[current_section].append('\n'.join(section_text))
+                section_text = []
+            current_section = detected_section
+        elif current_section:
+            section_text.append(line)
+        else:
+            # If no section detected yet, add to general section
+            sections['general'].append(line)
+
+    if current_section and section_text:
+        sections[current_section].append('\n'.join(section_text))
+
+    return {
+        'raw_text': text,
+        'sections': dict(sections),
+        'skills': categorize_skills(analyzer, text),
+        'metrics': extract_metrics(text),
+        'dates': extract_dates(text),
+        'section_statistics': {
+            section: {
+                'word_count': len(' '.join(content).split()),
+                'sentence_count': count_sentences(' '.join(content))
+            }
+            for section, content in sections.items()
+        }
+    }
+
+
+def calculate_ats_score(analyzer, resume_content: Dict[str, Any]) -> float:
+    """
+    Calculate an ATS score using industry-standard criteria with adjusted weighting.
+    Returns a realistic score between 55-80 based on content quality.
+    """
+    try:
+        if not resume_content or not isinstance(resume_content, dict):
+            print("Invalid resume content provided for ATS scoring.")
+            return 65.0
+
+        raw_text = resume_content.get('raw_text', '')
+        if not raw_text:
+            print("No raw text found in resume content.")
+            return 65.0
+
+        raw_text = raw_text.lower()
+        sections = resume_content.get('sections', {})
+
+        # FACTOR 1: KEYWORD MATCHING (30% of score)
+        total_keywords = len(analyzer.industry_keywords)
+        matched_keywords = 0
+        for keyword in analyzer.industry_keywords:
+            if re.search(r'\b' + re.escape(keyword) + r'\b', raw_text):
+                matched_keywords += 1
+        keyword_match_percentage = matched_keywords / total_keywords if total_keywords > 0 else 0
+        keyword_score = min(30 * keyword_match_percentage, 30)
+        if keyword_score < 15:
+            keyword_score = 15 + (keyword_score / 2)
+
+        # FACTOR 2: RESUME STRUCTURE (20% of score)
+        structure_score = 0
+        for section in ['experience', 'education', 'skills']:
+            if section in sections:
+                structure_score += 4
+        for section in ['summary', 'projects', 'certifications']:
+            if section in sections:
+                structure_score += 2.67
+        structure_score = max(min(structure_score, 20), 10)
+
+        # FACTOR 3: EXPERIENCE & EDUCATION QUALITY (20% of score)
+        quality_score = 0
+        metrics = resume_content.get('metrics', [])
+        if not isinstance(metrics, list):
+            metrics = []
+        if len(metrics) >= 5:
+            quality_score += 12
+        elif len(metrics) > 0:
+            quality_score += 6 + (len(metrics) * 1.5)
+        else:
+            quality_score += 6
+        dates = resume_content.get('dates', [])
+        if not isinstance(dates, list):
+            dates = []
+        if len(dates) >= 4:
+            quality_score += 8
+        elif len(dates) > 0:
+            quality_score += 4 + (len(dates))
+        else:
+            quality_score += 4
+        quality_score = min(quality_score, 20)
+
+        # FACTOR 4: FORMATTING & READABILITY (15% of score)
+        format_score = 0
+        word_count = len(raw_text.split())
+        if word_count >= 500:
+            format_score += 5
+        elif word_count >= 300:
+            format_score += 4
+        elif word_count >= 200:
+            format_score += 3.5
+        else:
+            format_score += 3
+        if len(sections) >= 5:
+            format_score += 5
+        elif len(sections) >= 3:
+            format_score += 4
+        else:
+            format_score += 3
+        bullets = re.findall(r'^\s*[•\-*]\s', raw_text, re.MULTILINE)
+        if len(bullets) >= 10:
+            format_score += 5
+        elif len(bullets) >= 5:
+            format_score += 4
+        elif len(bullets) > 0:
+            format_score += 3
+        else:
+            format_score += 2
+
+        # BASE SCORE (15% of total) plus small variance
+        final_score = keyword_score + structure_score + quality_score + format_score + 15
+        final_score += random.uniform(-1.0, 1.0)
+        if final_score < 55:
+            final_score += (55 - final_score) * 0.8
+        elif final_score > 80:
+            final_score -= (final_score - 40) * 0.8
+        final_score = max(min(final_score, 80), 55)
+        return round(final_score, 1)
+
+    except Exception as e:
+        print(f"Error calculating ATS score: {str(e)}\n{traceback.format_exc()}")
+        return 65.0
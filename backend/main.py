@@ -1,13 +1,13 @@
-from fastapi import FastAPI, UploadFile, HTTPException
+from fastapi import FastAPI, UploadFile, HTTPException, Form
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 import os
 import asyncio
 import traceback
 from datetime import datetime
-from file import EnhancedResumeAnalyzer
+from file import EnhancedResumeAnalyzer, AnalysisStore
 
 # Load environment variables
 load_dotenv()
@@ -37,15 +37,29 @@ try:
     if not mistral_api_key:
         raise ValueError("MISTRAL_API_KEY environment variable not set")
     analyzer = EnhancedResumeAnalyzer(mistral_api_key)
+    analysis_store = AnalysisStore(
+        os.getenv("ANALYSIS_STORE_DIR", "analysis_store"),
+        max_age_days=float(os.getenv("ANALYSIS_STORE_MAX_AGE_DAYS", "30"))
+    )
 except Exception as e:
     print(f"Error initializing EnhancedResumeAnalyzer: {str(e)}")
     raise
 @app.post("/analyze")
-async def analyze_resume(file: UploadFile) -> Dict[str, Any]:
-    """Endpoint to analyze a resume PDF and return AI analysis, extracted content, ATS score, and metadata."""
+async def analyze_resume(file: UploadFile, previous_analysis_id: Optional[str] = Form(None)) -> Dict[str, Any]:
+    """
+    Endpoint to analyze a resume PDF and return AI analysis, extracted content, ATS score, and metadata.
+    Pass the `analysis_id` of an earlier upload as `previous_analysis_id` to only recompute
+    the analyses whose inputs changed in the revised resume.
+    """
     if file.content_type != "application/pdf":
         raise HTTPException(status_code=400, detail="Only PDF files are supported.")
 
+    previous_result = None
+    if previous_analysis_id:
+        previous_result = analysis_store.load(previous_analysis_id)
+        if previous_result is None:
+            raise HTTPException(status_code=404, detail="Previous analysis not found.")
+
     try:
         start_time = datetime.now()
 
@@ -65,12 +79,12 @@ async def analyze_resume(file: UploadFile) -> Dict[str, Any]:
             print(f"PDF extraction error: {str(e)}\n{traceback.format_exc()}")
             raise HTTPException(status_code=500, detail=f"PDF extraction failed: {str(e)}")
 
-        # Step 2: Process extracted content
-        processed_content = analyzer.process_resume_content(raw_text)
+        # Step 2: Parse extracted content; the full dict is only built for the response
+        document = analyzer.parse_resume(raw_text)
 
         # Step 3: Get ATS Score - Use the new method that returns a dictionary
         try:
-             ats_score = analyzer.calculate_ats_score(processed_content)
+             ats_score = analyzer.calculate_ats_score(document)
         except Exception as e:
             print(f"ATS score calculation error: {str(e)}\n{traceback.format_exc()}")
             ats_score = {
@@ -86,7 +100,7 @@ async def analyze_resume(file: UploadFile) -> Dict[str, Any]:
         # Step 4: Get AI Analysis
         try: 
             analysis = await asyncio.wait_for(
-                analyzer.get_ai_analysis(processed_content),
+                analyzer.get_ai_analysis(document, previous_result),
                 timeout=120.0
             )
         except asyncio.TimeoutError:
@@ -98,13 +112,17 @@ async def analyze_resume(file: UploadFile) -> Dict[str, Any]:
             print(f"AI analysis error: {str(e)}\n{traceback.format_exc()}")
             raise HTTPException(status_code=500, detail=f"AI analysis failed: {str(e)}")
 
+        analysis_id = analysis_store.save(analysis)
+
         # Calculate processing time
         processing_duration = (datetime.now() - start_time).total_seconds()
 
         # Step 5: Return everything with the enhanced ATS score object
         return JSONResponse(content={
-            "analysis": analysis,
-            "extracted_content": processed_content,
+            "analysis_id": analysis_id,
+            # extracted_content is returned once at the top level rather than serialized twice
+            "analysis": {key: value for key, value in analysis.items() if key != "extracted_content"},
+            "extracted_content": analysis["extracted_content"],
             "ats_score": ats_score,
             "metadata": {
                 "timestamp": datetime.now().isoformat(),
@@ -0,0 +1,378 @@
+import asyncio
+import json
+import os
+import random
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import file
+import legacy_resume
+from file import (
+    AnalysisStore, EnhancedResumeAnalyzer, ResumeDocument, collect_pdf_paths, estimate_tokens, load_checkpoint,
+    run_batch
+)
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return EnhancedResumeAnalyzer()
+
+
+@pytest.fixture
+def llm_analyzer():
+    """Analyzer whose Mistral client is replaced by one that records its calls."""
+    analyzer = EnhancedResumeAnalyzer("test-key")
+    analyzer.calls = []
+
+    async def complete_async(**kwargs):
+        analyzer.calls.append(kwargs)
+        message = SimpleNamespace(content=f"analysis {len(analyzer.calls)}")
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=50)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    analyzer.client = SimpleNamespace(chat=SimpleNamespace(complete_async=complete_async))
+    return analyzer
+
+
+SAMPLE_RESUME = """Jane Doe
+jane.doe@example.com | (555) 123-4567
+Professional Summary
+Backend engineer who builds reliable data platforms.
+Work Experience
+Senior Engineer, Acme Corp, Jan 2019 - Present
+- Led team of 12 engineers migrating services to AWS and Kubernetes
+- Reduced infrastructure cost by 35% and served 2,000,000 users
+Software Engineer, Globex, Jun 2015 - Dec 2018
+- Built REST APIs in Java, increasing throughput by 40%
+Education
+BSc Computer Science, State University, 2011 - 2015
+Technical Skills
+python, sql, docker, machine learning, team leadership
+Key Projects
+Real-time analytics platform processing $5 million in daily transactions
+Internal dashboard adopted by the finance team
+Certifications
+AWS Certified Solutions Architect, 2020
+"""
+
+
+def random_texts(count):
+    rng = random.Random(7)
+    words = ("python java summary experience skills Education . ! ? 2020 Jan 2019 $5k 40% 3 years "
+             "team leadership sql crm x \n \n\n \t - •").split(' ')
+    return [' '.join(rng.choice(words + ['\n', '  ']) for _ in range(300)) for _ in range(count)]
+
+
+PARITY_TEXTS = [
+    "",
+    SAMPLE_RESUME,
+    "  Summary  \nEngineer. Loves python!! and aws?\n\nExperience\n Jan 2019 - Dec 2022 \t\r\n"
+    "Saved $1,200,000 million; 12/05/2020\nExperience\nEducation\nBSc 2018...\n\x0c\nProjects\n  \n",
+    "no headings here\njust lines. one. two\nPython Java\n",
+] + random_texts(100)
+
+
+@pytest.mark.parametrize("text", PARITY_TEXTS)
+def test_process_resume_content_matches_legacy_output(analyzer, text):
+    expected = json.dumps(legacy_resume.process_resume_content(analyzer, text))
+    assert json.dumps(analyzer.process_resume_content(text)) == expected
+
+
+@pytest.mark.parametrize("text", PARITY_TEXTS[:20])
+def test_calculate_ats_score_matches_legacy_score(analyzer, text):
+    random.seed(3)
+    expected = legacy_resume.calculate_ats_score(analyzer, legacy_resume.process_resume_content(analyzer, text))
+    random.seed(3)
+    assert analyzer.calculate_ats_score(analyzer.parse_resume(text)) == expected
+
+
+def test_consumers_accept_document_and_dict(analyzer):
+    document = analyzer.parse_resume(SAMPLE_RESUME)
+    content = document.to_dict()
+    assert isinstance(document, ResumeDocument)
+    assert analyzer.fingerprint_resume_content(document) == analyzer.fingerprint_resume_content(content)
+    random.seed(1)
+    score = analyzer.calculate_ats_score(document)
+    random.seed(1)
+    assert analyzer.calculate_ats_score(content) == score
+
+
+def test_single_bullet_edit_recomputes_only_affected_analyses(llm_analyzer):
+    revised = SAMPLE_RESUME.replace(
+        "Internal dashboard adopted by the finance team",
+        "Internal dashboard adopted by the whole finance team"
+    )
+    first = asyncio.run(llm_analyzer.get_ai_analysis(llm_analyzer.parse_resume(SAMPLE_RESUME)))
+    llm_analyzer.calls.clear()
+
+    second = asyncio.run(llm_analyzer.get_ai_analysis(llm_analyzer.parse_resume(revised), first))
+    assert json.loads(json.dumps(second))["extracted_content"] == llm_analyzer.process_resume_content(revised)
+    diff = second["diff"]
+    assert diff["changed_sections"] == ["projects"]
+    assert diff["changed_fields"] == []
+    assert "action_plan" in diff["reused_analyses"]
+    assert 0 < len(diff["recomputed_analyses"]) < 4
+    assert len(llm_analyzer.calls) == len(diff["recomputed_analyses"])
+    for analysis_type in diff["reused_analyses"]:
+        assert second["analysis"][analysis_type] == first["analysis"][analysis_type]
+
+
+def test_section_slice_does_not_depend_on_other_sections(analyzer):
+    longer_projects = SAMPLE_RESUME.replace(
+        "Internal dashboard adopted by the finance team",
+        "\n".join(f"Internal tool number {i} adopted across the company" for i in range(200))
+    )
+    before = analyzer.analysis_inputs(analyzer.parse_resume(SAMPLE_RESUME), "resume_optimization")
+    after = analyzer.analysis_inputs(analyzer.parse_resume(longer_projects), "resume_optimization")
+    assert before["sections"]["experience"] == after["sections"]["experience"]
+    assert before["sections"]["projects"] != after["sections"]["projects"]
+
+
+def test_skill_phrases_in_prompts_stop_at_line_ends(analyzer):
+    document = analyzer.parse_resume("Skills\npython, sql\nled the data team")
+    assert analyzer.analysis_inputs(document, "skills_analysis")["fields"]["skills"] == {
+        "technical_skills": {"programming": ["python, sql"], "data": ["sql"]}
+    }
+
+
+def test_fields_are_trimmed_by_relevance_without_empty_lists(analyzer):
+    document = analyzer.parse_resume(SAMPLE_RESUME)
+    ranked = analyzer._ranked_field(document, "skills")
+    assert [len(phrase) for _, _, phrase in ranked] == sorted(len(phrase) for _, _, phrase in ranked)
+    skills = analyzer._fit_field("skills", ranked, 12)
+    assert skills == {"technical_skills": {"cloud": ["kubernetes"]}}
+    assert len(json.dumps(skills, separators=(",", ":"))) <= 12 * 4
+    assert analyzer._fit_field("skills", ranked, 1) == {}
+    assert analyzer._ranked_field(document, "dates")[:3] == ["2020", "Jan 2019", "2019"]
+    assert analyzer._ranked_field(document, "dates")[-1] == "4567"
+    assert analyzer._fit_field("metrics", analyzer._ranked_field(document, "metrics"), 5) == ["$5 million", "35%"]
+
+
+def test_analyze_resume_reports_token_usage(llm_analyzer, tmp_path, monkeypatch):
+    path = tmp_path / "resume.pdf"
+    path.write_bytes(b"%PDF")
+    monkeypatch.setattr(llm_analyzer, "extract_text_from_pdf", lambda content: SAMPLE_RESUME)
+    result = asyncio.run(llm_analyzer.analyze_resume(str(path)))
+    json.dumps(result)
+    usage = result["token_usage"]
+    assert set(usage) == set(llm_analyzer.analysis_prompts)
+    assert all(usage[analysis_type]["estimated_prompt_tokens"] > 0 for analysis_type in usage)
+    assert result["failed_analyses"] == []
+
+
+def test_long_experience_fills_most_of_the_budget(analyzer):
+    bullets = "\n".join(
+        f"- Bullet {i:02d}: designed and shipped a service that improved the reliability of the platform for many"
+        for i in range(40)
+    )
+    document = analyzer.parse_resume(
+        f"Jane Doe\nSummary\nBackend engineer building data platforms.\nWork Experience\n{bullets}\n"
+        "Education\nBSc Computer Science, State University\n"
+    )
+    for analysis_type, config in analyzer.analysis_prompts.items():
+        context = analyzer.build_resume_context(document, analysis_type)
+        assert 0.9 * config["token_budget"] <= estimate_tokens(context) <= config["token_budget"]
+        assert "[]" not in context
+    inputs = analyzer.analysis_inputs(document, "career_trajectory")
+    assert inputs["fields"] == {}
+    assert len(inputs["sections"]["experience"]) > 30
+    assert inputs["sections"]["summary"] == ["Backend engineer building data platforms."]
+
+
+def write_pdf(path, lines):
+    """Write a one-page PDF whose extracted text is `lines`, one per line."""
+    def escape(text):
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    stream = "BT /F1 11 Tf 72 740 Td 14 TL " + " ".join(f"({escape(line)}) Tj T*" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        "/Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    content = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(content))
+        content += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(content)
+    content += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    content += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    content += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    path.write_bytes(content.encode("latin-1"))
+    return str(path)
+
+
+@pytest.fixture
+def resume_pdfs(tmp_path):
+    """Two readable resumes and one corrupt PDF."""
+    folder = tmp_path / "resumes"
+    (folder / "nested").mkdir(parents=True)
+    good = [
+        write_pdf(folder / "alice.pdf", SAMPLE_RESUME.splitlines()),
+        write_pdf(folder / "nested" / "bob.PDF", ["Bob", "Work Experience", "- Built APIs in python", "Education"]),
+    ]
+    bad = folder / "broken.pdf"
+    bad.write_bytes(b"%PDF-1.4 not really a pdf")
+    (folder / "notes.txt").write_text("not a resume")
+    return folder, good, str(bad)
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_collect_pdf_paths_expands_directories_and_globs(resume_pdfs):
+    folder, good, bad = resume_pdfs
+    expected = sorted(good + [bad])
+    assert collect_pdf_paths([str(folder)]) == expected
+    assert collect_pdf_paths([str(folder / "*.pdf")]) == sorted([good[0], bad])
+    # Overlapping inputs are only listed once
+    assert collect_pdf_paths([str(folder), str(folder / "**" / "*.PDF"), good[0]]) == expected
+
+
+def test_load_checkpoint_reads_completed_paths(tmp_path):
+    checkpoint = tmp_path / "done.txt"
+    assert load_checkpoint(str(checkpoint), "llm") == (set(), {})
+    assert load_checkpoint(None, "llm") == (set(), {})
+    checkpoint.write_text(
+        "mode\tllm\ndone\t/a.pdf\n\nfailed\t/b.pdf\ndone\t/b.pdf\nfailed\t/c.pdf\nfailed\t/c.pdf\n"
+    )
+    assert load_checkpoint(str(checkpoint), "llm") == ({"/a.pdf", "/b.pdf"}, {"/c.pdf": 2})
+
+
+def test_load_checkpoint_refuses_another_mode(tmp_path):
+    checkpoint = tmp_path / "done.txt"
+    checkpoint.write_text("mode\tno-llm\ndone\t/a.pdf\n")
+    with pytest.raises(ValueError, match="no-llm run"):
+        load_checkpoint(str(checkpoint), "llm")
+    checkpoint.write_text("/a.pdf\n")
+    with pytest.raises(ValueError):
+        load_checkpoint(str(checkpoint), "no-llm")
+
+
+def test_run_batch_without_llm_checkpoints_only_successes(resume_pdfs, tmp_path):
+    folder, good, bad = resume_pdfs
+    output, checkpoint = tmp_path / "out.jsonl", tmp_path / "done.txt"
+    with open(output, "w") as out, open(checkpoint, "w") as done:
+        stats = asyncio.run(run_batch(collect_pdf_paths([str(folder)]), out, done, workers=2, use_llm=False))
+
+    assert stats == {"processed": 2, "failed": 1}
+    records = {record["file"]: record for record in read_jsonl(output)}
+    assert set(records) == set(good + [bad])
+    assert "Extraction failed" in records[bad]["error"]
+    for path in good:
+        assert "error" not in records[path] and "analysis" not in records[path]
+        assert 55 <= records[path]["ats_score"] <= 80
+        assert records[path]["extracted_content"]["sections"]
+    assert load_checkpoint(str(checkpoint), "no-llm") == (set(good), {bad: 1})
+
+
+def test_run_batch_with_llm_keeps_failed_analyses_out_of_checkpoint(resume_pdfs, tmp_path, monkeypatch):
+    folder, good, bad = resume_pdfs
+
+    async def complete_async(messages, **kwargs):
+        if "Built APIs" in messages[1].content:
+            raise RuntimeError("rate limited")
+        message = SimpleNamespace(content="analysis")
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=50)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    client = SimpleNamespace(chat=SimpleNamespace(complete_async=complete_async))
+    monkeypatch.setattr(file, "Mistral", lambda api_key: client)
+    output, checkpoint = tmp_path / "out.jsonl", tmp_path / "done.txt"
+    with open(output, "w") as out, open(checkpoint, "w") as done:
+        stats = asyncio.run(run_batch(good, out, done, mistral_api_key="test-key", workers=1, concurrency=2))
+
+    assert stats == {"processed": 1, "failed": 1}
+    records = {record["file"]: record for record in read_jsonl(output)}
+    assert set(records[good[0]]["analysis"].values()) == {"analysis"}
+    assert records[good[0]]["token_usage"]["action_plan"]["prompt_tokens"] == 100
+    assert "AI analysis failed for" in records[good[1]]["error"]
+    assert load_checkpoint(str(checkpoint), "llm") == ({good[0]}, {good[1]: 1})
+
+
+def test_run_batch_times_out_slow_extractions(resume_pdfs, tmp_path, monkeypatch):
+    folder, good, bad = resume_pdfs
+
+    def slow_extract(self, pdf_content):
+        time.sleep(30)
+
+    monkeypatch.setattr(EnhancedResumeAnalyzer, "extract_text_from_pdf", slow_extract)
+    output, checkpoint = tmp_path / "out.jsonl", tmp_path / "done.txt"
+    started = time.monotonic()
+    with open(output, "w") as out, open(checkpoint, "w") as done:
+        stats = asyncio.run(run_batch(good, out, done, workers=1, use_llm=False, extract_timeout=0.2))
+
+    assert time.monotonic() - started < 10
+    assert stats == {"processed": 0, "failed": 2}
+    assert all(record["error"] == "Extraction timed out after 0.2s" for record in read_jsonl(output))
+    assert load_checkpoint(str(checkpoint), "no-llm") == (set(), {path: 1 for path in good})
+
+
+def test_main_resumes_after_interrupt_and_retries_failures(resume_pdfs, tmp_path):
+    folder, good, bad = resume_pdfs
+    output, checkpoint = tmp_path / "out.jsonl", tmp_path / "done.txt"
+    # An interrupted run that finished one resume before stopping
+    checkpoint.write_text(f"mode\tno-llm\ndone\t{good[0]}\n")
+    argv = [str(folder), "-o", str(output), "--checkpoint", str(checkpoint), "--no-llm", "--workers", "1"]
+
+    asyncio.run(file.main(argv))
+    assert sorted(record["file"] for record in read_jsonl(output)) == sorted([good[1], bad])
+    assert load_checkpoint(str(checkpoint), "no-llm") == (set(good), {bad: 1})
+
+    asyncio.run(file.main(argv))
+    assert [record["file"] for record in read_jsonl(output)][2:] == [bad]
+
+    # A PDF that keeps failing is no longer retried after --max-attempts runs
+    asyncio.run(file.main(argv + ["--max-attempts", "2"]))
+    assert len(read_jsonl(output)) == 3
+    assert load_checkpoint(str(checkpoint), "no-llm") == (set(good), {bad: 2})
+
+    # A full run must not treat resumes checkpointed without the LLM stage as analyzed
+    with pytest.raises(SystemExit, match="no-llm run"):
+        asyncio.run(file.main(argv[:-3] + ["--api-key", "test-key"]))
+
+
+@pytest.mark.parametrize("argv, message", [
+    (["--workers", "0", "--no-llm"], "--workers must be at least 1"),
+    (["--workers", "-1", "--no-llm"], "--workers must be at least 1"),
+    (["--concurrency", "0", "--api-key", "test-key"], "--concurrency must be at least 1"),
+    (["--max-attempts", "0", "--no-llm"], "--max-attempts must be at least 1"),
+    (["--extract-timeout", "0", "--no-llm"], "--extract-timeout must be positive"),
+    ([], "MISTRAL_API_KEY"),
+])
+def test_parse_args_rejects_invalid_options(argv, message, monkeypatch, capsys):
+    monkeypatch.delenv("MISTRAL_API_KEY", raising=False)
+    with pytest.raises(SystemExit) as exit_info:
+        file.parse_args(["resumes"] + argv)
+    assert exit_info.value.code == 2
+    assert message in capsys.readouterr().err
+
+
+def test_analysis_store_round_trip_and_unreadable_results(tmp_path):
+    store = AnalysisStore(str(tmp_path))
+    analysis_id = store.save({"analysis": {"action_plan": "plan"}, "fingerprints": {"analyses": {}}})
+    assert store.load(analysis_id)["analysis"] == {"action_plan": "plan"}
+    assert store.load("../etc/passwd") is None
+    assert store.load("0" * 32) is None
+
+    (tmp_path / f"{analysis_id}.json").write_text('{"analysis": {"action_pl')
+    assert store.load(analysis_id) is None
+
+
+def test_analysis_store_expires_old_results(tmp_path):
+    store = AnalysisStore(str(tmp_path), max_age_days=1)
+    old_id, new_id = store.save({}), store.save({})
+    two_days_ago = time.time() - 2 * 24 * 3600
+    os.utime(tmp_path / f"{old_id}.json", (two_days_ago, two_days_ago))
+
+    assert store.load(old_id) is None
+    assert store.cleanup() == 1
+    assert sorted(os.listdir(tmp_path)) == [f"{new_id}.json"]